@@ -1,15 +1,45 @@
 import streamlit as st
-import openai
-from dotenv import load_dotenv
+from tenacity import retry, retry_if_exception, stop_after_attempt, stop_after_delay, wait_random_exponential
 import os
-import json
-from typing import List, Dict
+import re
+import hashlib
+import orjson
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from types import SimpleNamespace
+from typing import List, Dict, Optional
 
-from prompts import SYSTEM_PROMPT, WELCOME_MESSAGE, DISCLAIMER
-from workflows import WORKFLOW_REGISTRY, get_workflow
+from prompts import (
+    WELCOME_MESSAGE, DISCLAIMER, build_messages,
+    ACK_CONFIRMED_INSTRUCTIONS, ACK_REQUESTED_INSTRUCTIONS, WORKFLOW_FOLLOW_UP_INSTRUCTIONS
+)
+
+@st.cache_resource
+def load_environment():
+    """Load environment variables from .env once per process rather than on every rerun"""
+    from dotenv import load_dotenv
+    load_dotenv()
 
 # Load environment variables
-load_dotenv()
+load_environment()
+
+# Number of most recent messages sent to the LLM with each request
+MAX_TURNS = 20
+
+# Once session history exceeds MAX_STORED_MESSAGES, the oldest MESSAGES_TO_EVICT are
+# spooled to disk and folded into a running summary that is sent with each request
+MAX_STORED_MESSAGES = 50
+MESSAGES_TO_EVICT = 25
+SUMMARY_MODEL = "gpt-4o-mini"
+SESSIONS_DIR = os.path.join("data", "sessions")
+
+# Chat responses are cached on the exact request payload (model settings plus every message sent)
+RESPONSE_CACHE_MAX_ENTRIES = 512
+CLASSIFICATION_CACHE_MAX_ENTRIES = 1024
+
+# Minimum time between re-renders of a streaming response (~20 updates per second)
+STREAM_RENDER_INTERVAL = 0.05
 
 # Page config
 st.set_page_config(
@@ -19,12 +49,82 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
+@st.cache_resource
+def load_registries() -> SimpleNamespace:
+    """
+    Import the workflow registry and compile its keyword prefilters once per process.
+    Prefilters let should_trigger run only for workflows that could plausibly match.
+    """
+    from workflows import WORKFLOW_REGISTRY, get_workflow
+    prefilters = {
+        workflow_id: re.compile(workflow.keyword_pattern, re.IGNORECASE)
+        for workflow_id, workflow in WORKFLOW_REGISTRY.items()
+    }
+    return SimpleNamespace(workflows=WORKFLOW_REGISTRY, get_workflow=get_workflow, prefilters=prefilters)
+
+registries = load_registries()
+
+@st.cache_resource
+def get_openai_client():
+    """
+    Create the OpenAI client once per process so its connection pool (and TLS sessions)
+    survive Streamlit reruns. Returns None if no API key is configured.
+    """
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        return None
+    # Imported here so the SDK and its dependencies load once, and only when a key is configured
+    import httpx
+    import openai
+    return openai.OpenAI(
+        api_key=api_key,
+        # Retries are owned by create_chat_completion's tenacity policy, not stacked on the SDK's own
+        max_retries=0,
+        http_client=httpx.Client(
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=10, max_connections=20),
+            timeout=httpx.Timeout(30.0, connect=5.0)
+        )
+    )
+
 # Initialize OpenAI client
-api_key = os.getenv("OPENAI_API_KEY")
-if api_key:
-    client = openai.OpenAI(api_key=api_key)
-else:
-    client = None
+client = get_openai_client()
+
+def is_rate_limit_error(exception: BaseException) -> bool:
+    """Whether an exception is an OpenAI rate-limit error (worth retrying)"""
+    import openai
+    return isinstance(exception, openai.RateLimitError)
+
+# Rate-limited requests are retried for at most this many seconds, so a turn can't stall for minutes
+CHAT_RETRY_BUDGET = 30
+
+@retry(
+    wait=wait_random_exponential(min=1, max=10),
+    stop=stop_after_attempt(5) | stop_after_delay(CHAT_RETRY_BUDGET),
+    retry=retry_if_exception(is_rate_limit_error),
+    reraise=True
+)
+def create_chat_completion(**kwargs):
+    """Call chat.completions.create, retrying rate-limit errors with exponential backoff"""
+    return client.chat.completions.create(**kwargs)
+
+@st.cache_resource
+def get_executor() -> ThreadPoolExecutor:
+    """Worker pool for running LLM calls concurrently, shared across reruns"""
+    return ThreadPoolExecutor(max_workers=4)
+
+@st.cache_resource
+def get_response_cache() -> Dict[str, str]:
+    """Exact-match cache of chat responses, shared across sessions and reruns"""
+    return {}
+
+@st.cache_resource
+def get_classification_cache() -> Dict[str, dict]:
+    """Cache of classifier verdicts keyed by a hash of their inputs, shared across sessions and reruns"""
+    return {}
+
+# Fetched here on the script thread so classifier calls on worker threads can share it
+classification_cache = get_classification_cache()
 
 # Initialize session state
 if "messages" not in st.session_state:
@@ -33,37 +133,29 @@ if "messages" not in st.session_state:
     st.session_state.conversation_context = {}
     st.session_state.appointment_offered = False
     st.session_state.offered_workflow_id = None
+    st.session_state.session_id = uuid.uuid4().hex
+    st.session_state.history_summary = None
 
-# Custom CSS for better UI
-st.markdown("""
-    <style>
-    .main-header {
-        background: linear-gradient(90deg, #10B981 0%, #059669 100%);
-        padding: 1rem;
-        border-radius: 10px;
-        margin-bottom: 1rem;
-        color: white;
-    }
-    .disclaimer-box {
-        background-color: #FEF3C7;
-        padding: 1rem;
-        border-radius: 8px;
-        border-left: 4px solid #F59E0B;
-        margin-bottom: 1rem;
-    }
-    .stChatMessage {
-        padding: 1rem;
-    }
-    </style>
-""", unsafe_allow_html=True)
+@st.cache_resource
+def load_css() -> str:
+    """Read the stylesheet from static/style.css once per process"""
+    css_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "style.css")
+    with open(css_path) as f:
+        return f"<style>\n{f.read()}</style>"
 
-# Header
-st.markdown(f"""
+HEADER_HTML = """
     <div class="main-header">
         <h1 style="margin:0; color: white;">💚 WellNavigator</h1>
         <p style="margin:0.5rem 0 0 0; color: white; font-size: 1.1rem;">Your empathetic healthcare navigation companion</p>
     </div>
-""", unsafe_allow_html=True)
+"""
+
+# Custom CSS for better UI
+# (Streamlit removes elements that a rerun doesn't re-emit, so this is still rendered every run)
+st.markdown(load_css(), unsafe_allow_html=True)
+
+# Header
+st.markdown(HEADER_HTML, unsafe_allow_html=True)
 
 # Sidebar for settings
 with st.sidebar:
@@ -103,23 +195,110 @@ with st.sidebar:
         st.session_state.conversation_context = {}
         st.session_state.appointment_offered = False
         st.session_state.offered_workflow_id = None
+        st.session_state.session_id = uuid.uuid4().hex
+        st.session_state.history_summary = None
         st.rerun()
     
     st.markdown("---")
     st.caption("💡 **Tip:** Share your situation freely. I'll ask questions if I need more context to help you best.")
 
-def prepare_messages_for_llm():
+def prepare_messages_for_llm(extra: List[Dict[str, str]] = None, instructions: str = None):
     """Prepare messages with system prompt for OpenAI API"""
-    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    # History entries are already role/content dicts, and the SDK only reads them
+    return build_messages(
+        st.session_state.messages[-MAX_TURNS:],
+        summary=st.session_state.get("history_summary"),
+        extra=extra,
+        instructions=instructions
+    )
+
+def render_stream(stream, placeholder) -> str:
+    """Render a streamed completion into a placeholder as it arrives and return the full text"""
+    full_response = ""
+    last_render = 0.0
+    
+    for chunk in stream:
+        content = chunk.choices[0].delta.content
+        # Skip chunks that carry no text (role-only or empty deltas)
+        if not content:
+            continue
+        full_response += content
+        # Re-rendering markdown dominates the loop, so coalesce updates in time
+        now = time.monotonic()
+        if now - last_render > STREAM_RENDER_INTERVAL:
+            placeholder.markdown(f"{full_response}▌")
+            last_render = now
+    
+    # Final render without the cursor
+    placeholder.markdown(full_response)
+    return full_response
+
+def response_cache_key(model: str, temperature: float, messages_for_api: List[Dict[str, str]]) -> str:
+    """
+    Hash model settings and the full API payload (system prompt, summary, history) into a response cache key.
+    Only requests whose entire context is identical share an entry, so no earlier context can differ.
+    """
+    key_material = orjson.dumps([model, temperature, messages_for_api])
+    return hashlib.sha256(key_material).hexdigest()
+
+def cache_response(cache_key: str, response: str):
+    """Store a response, evicting the oldest entry once the cache is full (empty responses aren't cached)"""
+    if not response:
+        return
+    response_cache = get_response_cache()
+    if len(response_cache) >= RESPONSE_CACHE_MAX_ENTRIES:
+        response_cache.pop(next(iter(response_cache)), None)
+    response_cache[cache_key] = response
+
+def spool_messages(messages: List[Dict[str, str]]):
+    """Append evicted messages to this session's transcript file on disk"""
+    os.makedirs(SESSIONS_DIR, exist_ok=True)
+    session_file = os.path.join(SESSIONS_DIR, f"{st.session_state.session_id}.jsonl")
+    with open(session_file, "ab") as f:
+        for msg in messages:
+            f.write(orjson.dumps(msg) + b"\n")
+
+def summarize_messages(messages: List[Dict[str, str]], previous_summary: str = None) -> str:
+    """
+    Summarize evicted messages (together with any earlier summary) so their context survives eviction.
+    Returns the previous summary unchanged if the LLM is unavailable.
+    """
+    if not client:
+        return previous_summary
     
-    # Add conversation history
-    for msg in st.session_state.messages:
-        messages.append({
-            "role": msg["role"],
-            "content": msg["content"]
-        })
+    transcript = "\n".join(f"{msg['role']}: {msg['content']}" for msg in messages)
+    summary_prompt = f"""Summarize this part of a conversation between a patient (or caregiver) and WellNavigator in a short paragraph.
+Keep the user's situation, conditions, concerns, upcoming appointments, and anything they asked to follow up on.
+
+Earlier summary: {previous_summary or "None"}
+
+Conversation:
+{transcript}"""
     
-    return messages
+    try:
+        response = create_chat_completion(
+            model=SUMMARY_MODEL,
+            messages=[
+                {"role": "system", "content": "You summarize healthcare support conversations concisely and accurately."},
+                {"role": "user", "content": summary_prompt}
+            ],
+            **get_model_params(SUMMARY_MODEL, temperature=0.2),
+            **get_token_param(SUMMARY_MODEL, 300)
+        )
+        return response.choices[0].message.content.strip()
+    except Exception:
+        return previous_summary
+
+def trim_message_history():
+    """Keep session history bounded: spool and summarize the oldest messages once it grows too long"""
+    if len(st.session_state.messages) <= MAX_STORED_MESSAGES:
+        return
+    
+    evicted = st.session_state.messages[:MESSAGES_TO_EVICT]
+    st.session_state.messages = st.session_state.messages[MESSAGES_TO_EVICT:]
+    
+    spool_messages(evicted)
+    st.session_state.history_summary = summarize_messages(evicted, st.session_state.get("history_summary"))
 
 def get_token_param(model: str, max_tokens: int):
     """
@@ -151,19 +330,109 @@ def get_model_params(model: str, temperature: float = 0.7, reasoning_effort: str
         return {"temperature": temperature}
 
 
-def detect_track_and_tool(user_message: str, conversation_history: list) -> dict:
+# Keyword patterns for the local track classifier (the "general" track is the fallback)
+TRACK_PATTERNS = {
+    "appointment": re.compile(r"\b(?:appointments?|appt|book(?:ing)?|schedul\w*|visits?|check-?ups?|consultations?)\b", re.IGNORECASE),
+    "results": re.compile(r"\b(?:results?|labs?|tests?|scans?|mri|ct|x-?rays?|blood ?work|biopsy|readings?|levels?)\b", re.IGNORECASE),
+    "resources": re.compile(r"\b(?:resources?|support groups?|services?|programs?|assistance|financial|insurance|near me|organi[sz]ations?|charit(?:y|ies))\b", re.IGNORECASE),
+    "caregiver": re.compile(r"\b(?:caregiv\w*|caring for|take care of|looking after|loved one|my (?:mom|mother|dad|father|parents?|husband|wife|partner|son|daughter|child))\b", re.IGNORECASE),
+}
+
+def classify_track_locally(user_message: str) -> dict:
     """
-    Use LLM to detect which track/tool would be most helpful.
-    Returns a dictionary with track info and suggested tool.
+    Classify the track with keyword patterns.
+    Returns None when no track matches or the top tracks tie, so the caller can fall back to the LLM.
+    """
+    scores = {track: len(pattern.findall(user_message)) for track, pattern in TRACK_PATTERNS.items()}
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    (best_track, best_score), (_, runner_up_score) = ranked[0], ranked[1]
+    
+    if best_score == 0 or best_score == runner_up_score:
+        return None
+    
+    return {
+        "track": best_track,
+        "confidence": "high" if runner_up_score == 0 else "medium",
+        "reasoning": f"Keyword match for {best_track} ({best_score} hits)"
+    }
+
+CLASSIFIER_MODEL = "gpt-4o-mini"
+
+# Each context message in the classifier prompt is capped at this many tokens
+CONTEXT_TOKENS_PER_MESSAGE = 120
+# Rough characters per token, for truncating when the tokenizer is unavailable
+CHARS_PER_TOKEN = 4
+
+@st.cache_resource
+def get_token_encoder():
+    """
+    Tokenizer for the classifier model, loaded once per process (a failure is cached too, so an
+    offline download isn't retried every turn). Returns None if it can't be loaded.
+    """
+    try:
+        import tiktoken
+        return tiktoken.encoding_for_model(CLASSIFIER_MODEL)
+    except Exception:
+        return None
+
+# Fetched here on the script thread so classifier calls on worker threads can share it
+token_encoder = get_token_encoder()
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to at most max_tokens tokens (approximated by characters without a tokenizer)"""
+    encoder = token_encoder
+    if encoder is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    token_ids = encoder.encode(text)
+    if len(token_ids) <= max_tokens:
+        return text
+    return encoder.decode(token_ids[:max_tokens])
+
+CONFIRMATION_TASK = """
+Also determine whether the user is confirming they want to BOOK/SCHEDULE an appointment (not just get guidance).
+Set "is_confirmation" to true ONLY if the assistant explicitly offered to HELP BOOK/SCHEDULE an appointment AND the user is confirming that booking request.
+
+Set "is_confirmation" to false if:
+- The assistant only offered guidance/preparation help (even if it mentioned appointments)
+- The assistant only suggested seeing a doctor (without offering to book)
+- The user is just confirming they want more information/guidance
+- The user is confirming something else entirely
+"""
+
+def classify_turn(user_message: str, conversation_history: list, check_confirmation: bool = False) -> dict:
+    """
+    Classify the conversation track and, optionally, whether the user is confirming a booking offer.
+    Both classifications come back from a single LLM request.
+    Returns a dict with track, confidence, reasoning (and is_confirmation), or None on failure.
     """
     if not client:
         return None
     
-    detection_prompt = f"""Based on this conversation, determine what kind of help the user needs most:
+    recent_context = [(m["role"], m["content"]) for m in conversation_history[-3:]]
+    cache_key = hashlib.blake2b(
+        orjson.dumps([user_message, recent_context, check_confirmation]),
+        digest_size=16
+    ).hexdigest()
+    cached = classification_cache.get(cache_key)
+    if cached is not None:
+        return dict(cached)
+    
+    response_fields = [
+        '    "track": "appointment|results|resources|caregiver|general"',
+        '    "confidence": "high|medium|low"',
+        '    "reasoning": "brief explanation"',
+    ]
+    if check_confirmation:
+        response_fields.append('    "is_confirmation": true or false')
+    response_format_fields = ",\n".join(response_fields)
+    
+    # Built inside the try, so a failure while assembling the prompt degrades to "no classification"
+    try:
+        detection_prompt = f"""Based on this conversation, determine what kind of help the user needs most:
 
 User's latest message: "{user_message}"
 
-Conversation context: {json.dumps([m["content"][:200] for m in conversation_history[-3:]])}
+Conversation context: {orjson.dumps([f"{role}: {truncate_tokens(content, CONTEXT_TOKENS_PER_MESSAGE)}" for role, content in recent_context]).decode()}
 
 Determine which track fits best:
 1. "appointment" - User needs help preparing for or booking appointments
@@ -171,125 +440,106 @@ Determine which track fits best:
 3. "resources" - User needs to find resources, support groups, or services
 4. "caregiver" - User needs caregiver support or advice
 5. "general" - General health navigation or unclear
-
+{CONFIRMATION_TASK if check_confirmation else ""}
 Respond ONLY with valid JSON in this exact format:
 {{
-    "track": "appointment|results|resources|caregiver|general",
-    "confidence": "high|medium|low",
-    "reasoning": "brief explanation"
+{response_format_fields}
 }}"""
-
-    try:
-        # Use gpt-5 for classification if available, fallback to gpt-4o-mini
-        detection_model = "gpt-5"
-        response = client.chat.completions.create(
-            model=detection_model,
+        
+        response = create_chat_completion(
+            model=CLASSIFIER_MODEL,
             messages=[
-                {"role": "system", "content": "You are a healthcare intent classifier. Respond only with valid JSON."},
+                {"role": "system", "content": "You are a healthcare intent classifier. Be strict about booking confirmations. Respond only with valid JSON."},
                 {"role": "user", "content": detection_prompt}
             ],
-            **get_model_params(detection_model, temperature=0.3, reasoning_effort="low"),
-            **get_token_param(detection_model, 200)
+            response_format={"type": "json_object"},
+            **get_model_params(CLASSIFIER_MODEL, temperature=0.2, reasoning_effort="low"),
+            **get_token_param(CLASSIFIER_MODEL, 200)
         )
         
-        result = json.loads(response.choices[0].message.content)
-        return result
+        result = orjson.loads(response.choices[0].message.content)
     except Exception as e:
         return None
+    
+    # Only successful verdicts are cached, so transient failures are retried next time
+    if len(classification_cache) >= CLASSIFICATION_CACHE_MAX_ENTRIES:
+        classification_cache.pop(next(iter(classification_cache)), None)
+    classification_cache[cache_key] = result
+    return dict(result)
 
-def detect_confirmation(user_message: str, conversation_context: List[Dict[str, str]]) -> bool:
+def detect_track_and_tool(user_message: str, conversation_history: list) -> dict:
     """
-    Surgically detect if user is confirming APPOINTMENT BOOKING (not just general guidance).
-    Must check full context to see what was actually offered.
+    Detect which track/tool would be most helpful.
+    Obvious cases are classified locally; the LLM is only used when keywords are inconclusive.
+    Returns a dictionary with track info and suggested tool.
     """
-    if not client:
-        return False
-    
-    # Simple keyword check first (fast)
-    message_lower = user_message.lower()
-    confirmation_keywords = ["yes", "yeah", "yep", "sure", "okay", "ok", "sounds good", 
-                            "that works", "let's do it", "let's do that", "i'd like that",
-                            "please", "that would be great", "sounds great"]
-    
-    if not any(keyword in message_lower for keyword in confirmation_keywords):
-        return False
-    
-    # Use LLM to verify it's actually a BOOKING confirmation, not general guidance confirmation
-    context_text = "\n".join([
-        f"{msg.get('role', 'user')}: {msg.get('content', '')[:200]}"
-        for msg in conversation_context[-4:]  # Last 4 messages for context
-    ])
-    
-    check_prompt = f"""You are detecting if a user is confirming they want to BOOK/SCHEDULE an appointment (not just get guidance).
+    return classify_track_locally(user_message) or classify_turn(user_message, conversation_history)
 
-Recent conversation:
-{context_text}
+# Track detection is skipped when a message adds fewer than this many words not seen at the last classification
+MIN_NEW_TOKENS_FOR_TRACK = 2
 
-User's latest message: "{user_message}"
+def tokenize(text: str) -> set:
+    """Lowercased word set used to tell whether a message brings anything new"""
+    return set(re.findall(r"[a-z0-9']+", text.lower()))
 
-CRITICAL: Only return "yes" if the assistant explicitly offered to HELP BOOK/SCHEDULE an appointment AND the user is confirming that booking request.
+def should_reuse_track(user_message: str) -> bool:
+    """
+    Whether the previously detected track still applies, because the message
+    adds almost nothing beyond the one it was classified on.
+    """
+    context = st.session_state.conversation_context
+    if context.get("track_info") is None or "classified_tokens" not in context:
+        return False
+    new_tokens = tokenize(user_message) - context["classified_tokens"]
+    return len(new_tokens) < MIN_NEW_TOKENS_FOR_TRACK
 
-Return "no" if:
-- The assistant only offered guidance/preparation help (even if it mentioned appointments)
-- The assistant only suggested seeing a doctor (without offering to book)
-- The user is just confirming they want more information/guidance
-- The user is confirming something else entirely
+CONFIRMATION_KEYWORDS = ("yes", "yeah", "yep", "sure", "okay", "ok", "sounds good",
+                         "that works", "let's do it", "let's do that", "i'd like that",
+                         "please", "that would be great", "sounds great")
+CONFIRM_RE = re.compile(r"\b(?:" + "|".join(map(re.escape, CONFIRMATION_KEYWORDS)) + r")\b", re.IGNORECASE)
+# A reply made up entirely of confirmation keywords ("yes please!", "ok sounds good") is accepted
+# without LLM verification; anything else that mentions one is verified
+CONFIRMATION_WORDS = "(?:" + "|".join(map(re.escape, CONFIRMATION_KEYWORDS)) + ")"
+CONFIRM_ONLY_RE = re.compile(rf"\s*{CONFIRMATION_WORDS}(?:\s+{CONFIRMATION_WORDS})*\s*", re.IGNORECASE)
+CONFIRMATION_PUNCTUATION_RE = re.compile(r"[.,!]")
 
-Respond with only "yes" or "no"."""
-    
-    try:
-        # Use gpt-5 for better confirmation detection
-        confirmation_model = "gpt-5"
-        response = client.chat.completions.create(
-            model=confirmation_model,
-            messages=[
-                {"role": "system", "content": "You are a confirmation detector for appointment booking. You must be strict - only return 'yes' for explicit booking confirmations. Respond with only 'yes' or 'no'."},
-                {"role": "user", "content": check_prompt}
-            ],
-            **get_model_params(confirmation_model, temperature=0.1, reasoning_effort="minimal"),
-            **get_token_param(confirmation_model, 10)
-        )
-        result = response.choices[0].message.content.strip().lower()
-        return result == "yes"
-    except:
-        # Fallback: be conservative - don't trigger if we can't verify
+def match_confirmation_keywords(user_message: str) -> Optional[bool]:
+    """
+    Decide a booking confirmation from keywords alone.
+    Returns True for a pure confirmation, False if no confirmation keyword appears, or None when the
+    LLM needs to verify the message (questions, and confirmations mixed with anything else).
+    """
+    if not CONFIRM_RE.search(user_message):
         return False
+    
+    if "?" not in user_message and CONFIRM_ONLY_RE.fullmatch(CONFIRMATION_PUNCTUATION_RE.sub(" ", user_message)):
+        return True
+    
+    return None
+
+# Only trigger on explicit booking/scheduling offers
+# Must have both "book"/"schedule" AND "appointment" in close context
+EXPLICIT_BOOKING_PHRASES = (
+    "help you book",
+    "help with booking",
+    "help booking",
+    "book an appointment",
+    "schedule an appointment",
+    "make an appointment",
+    "book your appointment",
+    "schedule your appointment",
+    "can book",
+    "can schedule"
+)
+BOOKING_OFFER_RE = re.compile("|".join(map(re.escape, EXPLICIT_BOOKING_PHRASES)), re.IGNORECASE)
 
 def detect_appointment_offer_in_response(response: str) -> bool:
     """
     Detect if chatbot's response offered to help with appointment BOOKING (not just appointment-related guidance).
     This should only trigger on explicit booking offers, not general appointment discussion.
+    Preparation/guidance-only responses contain none of the booking phrases, so one regex pass decides it.
     """
-    response_lower = response.lower()
-    
-    # Only trigger on explicit booking/scheduling offers
-    # Must have both "book"/"schedule" AND "appointment" in close context
-    explicit_booking_phrases = [
-        "help you book",
-        "help with booking",
-        "help booking",
-        "book an appointment",
-        "schedule an appointment",
-        "make an appointment",
-        "book your appointment",
-        "schedule your appointment",
-        "can book",
-        "can schedule"
-    ]
-    
-    # Check if any explicit booking phrase exists
-    has_booking_offer = any(phrase in response_lower for phrase in explicit_booking_phrases)
-    
-    # Exclude if it's just about preparation/guidance for appointments (not booking)
-    is_preparation_only = any(phrase in response_lower for phrase in [
-        "prepare for",
-        "preparation",
-        "guidance on",
-        "what to do",
-        "how to prepare"
-    ]) and not has_booking_offer
-    
-    return has_booking_offer and not is_preparation_only
+    return BOOKING_OFFER_RE.search(response) is not None
 
 # Show welcome message if not shown yet
 if not st.session_state.welcome_shown and len(st.session_state.messages) == 0:
@@ -308,22 +558,43 @@ for message in st.session_state.messages:
 if prompt := st.chat_input("Tell me what's going on—how can I support you today?"):
     # Add user message to chat history
     st.session_state.messages.append({"role": "user", "content": prompt})
+    trim_message_history()
     
     # Display user message
     with st.chat_message("user"):
         st.markdown(prompt)
     
+    awaiting_confirmation = bool(
+        st.session_state.get("appointment_offered") and st.session_state.get("offered_workflow_id")
+    )
+    is_confirmation = match_confirmation_keywords(prompt) if awaiting_confirmation else False
+    
+    track_future = None
+    turn_classification = None
+    if client and is_confirmation is None:
+        # The confirmation needs LLM verification, so classify the track in the same request
+        # (if verification fails, be conservative: the booking isn't confirmed)
+        turn_classification = classify_turn(prompt, st.session_state.messages, check_confirmation=True)
+        is_confirmation = bool(turn_classification and turn_classification.get("is_confirmation"))
+    elif client and len(st.session_state.messages) >= 2 and not should_reuse_track(prompt):
+        # Start track detection in the background so it overlaps with the other LLM calls this turn
+        track_future = get_executor().submit(
+            detect_track_and_tool,
+            prompt,
+            list(st.session_state.messages)
+        )
+    
     # Check for workflow triggers first
     workflow_triggered = False
     workflow_result = None
     
     if client:
         # FIRST: Check if a workflow was previously offered and user is confirming
-        if st.session_state.get("appointment_offered") and st.session_state.get("offered_workflow_id"):
-            if detect_confirmation(prompt, st.session_state.messages[-3:]):
+        if awaiting_confirmation:
+            if is_confirmation:
                 # User confirmed - trigger the offered workflow
                 workflow_id = st.session_state.offered_workflow_id
-                workflow = get_workflow(workflow_id)
+                workflow = registries.get_workflow(workflow_id)
                 
                 if workflow:
                     workflow_triggered = True
@@ -331,54 +602,51 @@ if prompt := st.chat_input("Tell me what's going on—how can I support you toda
                     # Get natural acknowledgment for confirmation
                     with st.chat_message("assistant"):
                         # Prepare messages for acknowledgment - explicitly state that we WILL book the appointment
-                        acknowledgment_messages = [{"role": "system", "content": SYSTEM_PROMPT + "\n\nIMPORTANT: The user has confirmed they want to book an appointment, and you (WellNavigator) WILL be booking it for them through the appointment booking system. Acknowledge their confirmation warmly and confirm that you're helping them book it (1-2 sentences max). Do NOT say you cannot book - you ARE booking it. Be conversational and brief."}]
-                        for msg in st.session_state.messages:
-                            acknowledgment_messages.append({
-                                "role": msg["role"],
-                                "content": msg["content"]
-                            })
+                        # The system prompt stays byte-identical (cacheable prefix); the instruction trails the history
+                        acknowledgment_messages = prepare_messages_for_llm(instructions=ACK_CONFIRMED_INSTRUCTIONS)
                         
                         try:
-                            ack_response = client.chat.completions.create(
+                            # Request the acknowledgment in the background so it overlaps the workflow run,
+                            # then stream it into a placeholder that sits above the workflow UI
+                            ack_placeholder = st.empty()
+                            ack_future = get_executor().submit(
+                                create_chat_completion,
                                 model=model,
                                 messages=acknowledgment_messages,
                                 **get_model_params(model, temperature=temperature, reasoning_effort="low"),
-                                **get_token_param(model, 150)
+                                **get_token_param(model, 150),
+                                stream=True
                             )
-                            acknowledgment = ack_response.choices[0].message.content.strip()
-                            st.markdown(acknowledgment)
                             
                             # Execute the workflow
                             workflow_result = workflow.execute({"intent": "confirmed"})
                             
+                            acknowledgment = render_stream(ack_future.result(), ack_placeholder).strip()
+                            
                             # Combine acknowledgment + workflow result
                             if workflow_result.get("status") == "completed":
                                 workflow_message = workflow_result.get("message", "Workflow completed.")
+                                # Show the result now so the screen matches what is stored in history
+                                st.markdown(workflow_message)
                                 
                                 # Generate natural follow-up to continue conversation
-                                follow_up_messages = [{"role": "system", "content": SYSTEM_PROMPT + f"\n\nCRITICAL: You (WellNavigator) have JUST SUCCESSFULLY completed a workflow for the user. The workflow result message is: '{workflow_message}'\n\nGenerate a brief, natural follow-up message (1-2 sentences) that:\n- Acknowledges that the workflow was successfully completed (e.g., the appointment WAS booked)\n- Offers to help with next steps related to what was just completed (e.g., preparing for the appointment, answering questions about it)\n- Keeps the conversation warm and supportive\n- Is conversational, not formal\n- Do NOT contradict what just happened - if an appointment was booked, acknowledge it was booked successfully\n- Do NOT repeat information already shown in the workflow details above\n- Just transition naturally to offer continued support"}]
                                 # Add conversation history including the acknowledgment and workflow completion
-                                for msg in st.session_state.messages:
-                                    follow_up_messages.append({
-                                        "role": msg["role"],
-                                        "content": msg["content"]
-                                    })
-                                follow_up_messages.append({
-                                    "role": "assistant",
-                                    "content": f"{acknowledgment}\n\n{workflow_message}"
-                                })
+                                follow_up_messages = prepare_messages_for_llm(
+                                    extra=[{"role": "assistant", "content": f"{acknowledgment}\n\n{workflow_message}"}],
+                                    instructions=WORKFLOW_FOLLOW_UP_INSTRUCTIONS.format(workflow_message=workflow_message)
+                                )
                                 
                                 try:
                                     # Handle GPT-5 vs other models
                                     if model and model.startswith("gpt-5"):
-                                        follow_up_response = client.chat.completions.create(
+                                        follow_up_response = create_chat_completion(
                                             model=model,
                                             messages=follow_up_messages,
                                             reasoning_effort="low",
                                             max_completion_tokens=100
                                         )
                                     else:
-                                        follow_up_response = client.chat.completions.create(
+                                        follow_up_response = create_chat_completion(
                                             model=model,
                                             messages=follow_up_messages,
                                             temperature=temperature,
@@ -400,10 +668,13 @@ if prompt := st.chat_input("Tell me what's going on—how can I support you toda
                                     "content": full_response
                                 })
                         except Exception as e:
-                            # Fallback: just execute workflow
-                            workflow_result = workflow.execute({"intent": "confirmed"})
+                            # Fallback: just execute workflow (unless it already ran)
+                            if workflow_result is None:
+                                workflow_result = workflow.execute({"intent": "confirmed"})
                             if workflow_result.get("status") == "completed":
                                 workflow_message = workflow_result.get("message", "Workflow completed.")
+                                # Show the result now so the screen matches what is stored in history
+                                st.markdown(workflow_message)
                                 st.session_state.messages.append({
                                     "role": "assistant",
                                     "content": workflow_message
@@ -415,70 +686,79 @@ if prompt := st.chat_input("Tell me what's going on—how can I support you toda
         
         # SECOND: Check for direct workflow triggers (explicit user requests)
         if not workflow_triggered:
-            for workflow_id, workflow in WORKFLOW_REGISTRY.items():
-                trigger_info = workflow.should_trigger(
+            candidates = [
+                (workflow_id, workflow) for workflow_id, workflow in registries.workflows.items()
+                if registries.prefilters[workflow_id].search(prompt)
+            ]
+            # Evaluate candidates concurrently; the first high-confidence result wins
+            trigger_futures = {
+                get_executor().submit(
+                    workflow.should_trigger,
                     user_message=prompt,
                     conversation_context=st.session_state.messages[-5:]  # Last 5 messages for context
-                )
+                ): (workflow_id, workflow)
+                for workflow_id, workflow in candidates
+            }
+            for trigger_future in as_completed(trigger_futures):
+                workflow_id, workflow = trigger_futures[trigger_future]
+                trigger_info = trigger_future.result()
                 
                 # Only trigger if confidence is high and workflow says it should trigger
                 if trigger_info.get("should_trigger") and trigger_info.get("confidence") == "high":
                     workflow_triggered = True
+                    for pending_future in trigger_futures:
+                        pending_future.cancel()
                     
                     # First, get a natural conversational acknowledgment from the LLM
                     with st.chat_message("assistant"):
                         # Prepare messages for acknowledgment - explicitly state that we WILL book the appointment
-                        acknowledgment_messages = [{"role": "system", "content": SYSTEM_PROMPT + "\n\nIMPORTANT: The user has requested to book an appointment, and you (WellNavigator) WILL be booking it for them through the appointment booking system. Acknowledge their request warmly and confirm that you're helping them book it (1-2 sentences max). Do NOT say you cannot book - you ARE booking it. Be conversational and brief."}]
-                        for msg in st.session_state.messages:
-                            acknowledgment_messages.append({
-                                "role": msg["role"],
-                                "content": msg["content"]
-                            })
+                        # The system prompt stays byte-identical (cacheable prefix); the instruction trails the history
+                        acknowledgment_messages = prepare_messages_for_llm(instructions=ACK_REQUESTED_INSTRUCTIONS)
                         
                         # Get brief acknowledgment
                         try:
-                            ack_response = client.chat.completions.create(
+                            # Request the acknowledgment in the background so it overlaps the workflow run,
+                            # then stream it into a placeholder that sits above the workflow UI
+                            ack_placeholder = st.empty()
+                            ack_future = get_executor().submit(
+                                create_chat_completion,
                                 model=model,
                                 messages=acknowledgment_messages,
                                 **get_model_params(model, temperature=temperature, reasoning_effort="low"),
-                                **get_token_param(model, 150)  # Keep it brief but natural
+                                **get_token_param(model, 150),  # Keep it brief but natural
+                                stream=True
                             )
-                            acknowledgment = ack_response.choices[0].message.content.strip()
-                            
-                            # Display acknowledgment
-                            st.markdown(acknowledgment)
                             
                             # Now execute the workflow seamlessly
                             workflow_result = workflow.execute(trigger_info.get("context", {}))
                             
+                            # Display acknowledgment
+                            acknowledgment = render_stream(ack_future.result(), ack_placeholder).strip()
+                            
                             # Combine acknowledgment + workflow result for chat history
                             if workflow_result.get("status") == "completed":
                                 workflow_message = workflow_result.get("message", "Workflow completed.")
+                                # Show the result now so the screen matches what is stored in history
+                                st.markdown(workflow_message)
                                 
                                 # Generate natural follow-up to continue conversation
-                                follow_up_messages = [{"role": "system", "content": SYSTEM_PROMPT + f"\n\nCRITICAL: You (WellNavigator) have JUST SUCCESSFULLY completed a workflow for the user. The workflow result message is: '{workflow_message}'\n\nGenerate a brief, natural follow-up message (1-2 sentences) that:\n- Acknowledges that the workflow was successfully completed (e.g., the appointment WAS booked)\n- Offers to help with next steps related to what was just completed (e.g., preparing for the appointment, answering questions about it)\n- Keeps the conversation warm and supportive\n- Is conversational, not formal\n- Do NOT contradict what just happened - if an appointment was booked, acknowledge it was booked successfully\n- Do NOT repeat information already shown in the workflow details above\n- Just transition naturally to offer continued support"}]
                                 # Add conversation history including the acknowledgment and workflow completion
-                                for msg in st.session_state.messages:
-                                    follow_up_messages.append({
-                                        "role": msg["role"],
-                                        "content": msg["content"]
-                                    })
-                                follow_up_messages.append({
-                                    "role": "assistant",
-                                    "content": f"{acknowledgment}\n\n{workflow_message}"
-                                })
+                                follow_up_messages = prepare_messages_for_llm(
+                                    extra=[{"role": "assistant", "content": f"{acknowledgment}\n\n{workflow_message}"}],
+                                    instructions=WORKFLOW_FOLLOW_UP_INSTRUCTIONS.format(workflow_message=workflow_message)
+                                )
                                 
                                 try:
                                     # Handle GPT-5 vs other models
                                     if model and model.startswith("gpt-5"):
-                                        follow_up_response = client.chat.completions.create(
+                                        follow_up_response = create_chat_completion(
                                             model=model,
                                             messages=follow_up_messages,
                                             reasoning_effort="low",
                                             max_completion_tokens=100
                                         )
                                     else:
-                                        follow_up_response = client.chat.completions.create(
+                                        follow_up_response = create_chat_completion(
                                             model=model,
                                             messages=follow_up_messages,
                                             temperature=temperature,
@@ -501,10 +781,13 @@ if prompt := st.chat_input("Tell me what's going on—how can I support you toda
                                     "content": full_response
                                 })
                         except Exception as e:
-                            # Fallback: just execute workflow if acknowledgment fails
-                            workflow_result = workflow.execute(trigger_info.get("context", {}))
+                            # Fallback: just execute workflow if acknowledgment fails (unless it already ran)
+                            if workflow_result is None:
+                                workflow_result = workflow.execute(trigger_info.get("context", {}))
                             if workflow_result.get("status") == "completed":
                                 workflow_message = workflow_result.get("message", "Workflow completed.")
+                                # Show the result now so the screen matches what is stored in history
+                                st.markdown(workflow_message)
                                 st.session_state.messages.append({
                                     "role": "assistant",
                                     "content": workflow_message
@@ -519,55 +802,51 @@ if prompt := st.chat_input("Tell me what's going on—how can I support you toda
             with st.chat_message("assistant"):
                 with st.spinner("Thinking..."):
                     try:
-                        # Detect track/tool if we have enough context
-                        track_info = None
-                        if len(st.session_state.messages) >= 2:
-                            track_info = detect_track_and_tool(
-                                prompt,
-                                st.session_state.messages
-                            )
+                        response_placeholder = st.empty()
                         
                         # Prepare messages for API (includes system prompt)
                         messages_for_api = prepare_messages_for_llm()
                         
-                        # Stream response
-                        # Prepare model-specific parameters
-                        model_params = get_model_params(model, temperature=temperature, reasoning_effort="medium")
-                        token_params = get_token_param(model, 2000)  # Reasonable default for streaming
-                        
-                        stream = client.chat.completions.create(
-                            model=model,
-                            messages=messages_for_api,
-                            **model_params,
-                            **token_params,
-                            stream=True
-                        )
-                        
-                        # Collect streamed response
-                        response_parts = []
-                        response_placeholder = st.empty()
-                        full_response = ""
-                        
-                        for chunk in stream:
-                            if chunk.choices[0].delta.content is not None:
-                                content = chunk.choices[0].delta.content
-                                response_parts.append(content)
-                                full_response = "".join(response_parts)
-                                response_placeholder.markdown(full_response + "▌")
+                        # Repeated openings (greetings, "what can you do") are served from the response cache
+                        cache_key = response_cache_key(model, temperature, messages_for_api)
+                        response = get_response_cache().get(cache_key)
                         
-                        # Finalize the response
-                        response = full_response
+                        if not response:
+                            # Stream response
+                            # Prepare model-specific parameters
+                            model_params = get_model_params(model, temperature=temperature, reasoning_effort="medium")
+                            token_params = get_token_param(model, 2000)  # Reasonable default for streaming
+                            
+                            stream = create_chat_completion(
+                                model=model,
+                                messages=messages_for_api,
+                                **model_params,
+                                **token_params,
+                                stream=True
+                            )
+                            
+                            # Collect streamed response
+                            response = render_stream(stream, response_placeholder)
+                            cache_response(cache_key, response)
+                        else:
+                            response_placeholder.markdown(response)
                         
                         # Track if chatbot offered appointment booking (for conversational workflow triggering)
                         if detect_appointment_offer_in_response(response):
                             st.session_state.appointment_offered = True
                             st.session_state.offered_workflow_id = "appointment_booking"
                         
-                        # Update placeholder with final response (without cursor)
-                        response_placeholder.markdown(response)
-                        
                         # Add assistant response to chat history AFTER finalizing
                         st.session_state.messages.append({"role": "assistant", "content": response})
+                        
+                        # Collect the track detected in the background (or alongside the confirmation check)
+                        if track_future is not None:
+                            st.session_state.conversation_context["track_info"] = track_future.result()
+                            st.session_state.conversation_context["classified_tokens"] = tokenize(prompt)
+                        elif turn_classification is not None:
+                            st.session_state.conversation_context["track_info"] = (
+                                classify_track_locally(prompt) or turn_classification
+                            )
                     
                     except Exception as e:
                         error_message = f"I apologize, but I encountered an error: {str(e)}\n\nPlease try again, or rephrase your question."
@@ -0,0 +1,62 @@
+"""
+WellNavigator System Prompts and Message Templates
+"""
+
+import functools
+from pathlib import Path
+
+
+@functools.lru_cache(maxsize=1)
+def system_prompt() -> str:
+    """Load the system prompt text from system.md (read once per process)"""
+    return (Path(__file__).parent / "system.md").read_text(encoding="utf-8").strip()
+
+SYSTEM_PROMPT = system_prompt()
+
+# Static first message of every chat request - never interpolate per-request data into it
+SYSTEM_MESSAGE = {"role": "system", "content": SYSTEM_PROMPT}
+
+
+def build_messages(history, summary=None, extra=None, instructions=None):
+    """
+    Assemble chat messages with SYSTEM_MESSAGE first and all dynamic content after it:
+    the running summary, the history, any extra turns, then per-turn instructions.
+    Keeping the prefix byte-identical lets OpenAI's prompt caching reuse it across requests.
+    """
+    messages = [SYSTEM_MESSAGE]
+    if summary:
+        messages.append({"role": "system", "content": f"[summary of earlier conversation]: {summary}"})
+    messages.extend(history)
+    if extra:
+        messages.extend(extra)
+    if instructions:
+        messages.append({"role": "system", "content": instructions})
+    return messages
+
+WELCOME_MESSAGE = """Hi there. I'm WellNavigator, and I'm here to support you through your health journey. 
+
+I have clinical knowledge that helps me understand medical concepts and explain things in ways that make sense. I can help you understand test results, medical conditions, symptoms, and treatments—always in plain language and with empathy.
+
+**Important note:** While I have clinical understanding to help guide and explain, I'm not a doctor and cannot diagnose or replace healthcare professionals. Always consult with your healthcare providers for medical advice and treatment decisions.
+
+Tell me what's going on—how can I support you today?"""
+
+DISCLAIMER = "*I have clinical understanding to help explain and guide, but I'm not a doctor and cannot diagnose or replace healthcare professionals. Please consult with your healthcare providers for medical advice and treatment decisions.*"
+
+
+# Per-turn instructions for workflow turns. These are sent as a separate system message after the
+# conversation so that SYSTEM_PROMPT stays a byte-identical prefix for OpenAI's prompt caching.
+ACK_CONFIRMED_INSTRUCTIONS = "IMPORTANT: The user has confirmed they want to book an appointment, and you (WellNavigator) WILL be booking it for them through the appointment booking system. Acknowledge their confirmation warmly and confirm that you're helping them book it (1-2 sentences max). Do NOT say you cannot book - you ARE booking it. Be conversational and brief."
+
+ACK_REQUESTED_INSTRUCTIONS = "IMPORTANT: The user has requested to book an appointment, and you (WellNavigator) WILL be booking it for them through the appointment booking system. Acknowledge their request warmly and confirm that you're helping them book it (1-2 sentences max). Do NOT say you cannot book - you ARE booking it. Be conversational and brief."
+
+WORKFLOW_FOLLOW_UP_INSTRUCTIONS = """CRITICAL: You (WellNavigator) have JUST SUCCESSFULLY completed a workflow for the user. The workflow result message is: '{workflow_message}'
+
+Generate a brief, natural follow-up message (1-2 sentences) that:
+- Acknowledges that the workflow was successfully completed (e.g., the appointment WAS booked)
+- Offers to help with next steps related to what was just completed (e.g., preparing for the appointment, answering questions about it)
+- Keeps the conversation warm and supportive
+- Is conversational, not formal
+- Do NOT contradict what just happened - if an appointment was booked, acknowledge it was booked successfully
+- Do NOT repeat information already shown in the workflow details above
+- Just transition naturally to offer continued support"""
@@ -0,0 +1,45 @@
+"""
+Testing Framework Interfaces - Protocols the test runner depends on, plus explicit stubs for offline smoke tests
+"""
+
+from typing import Any, Dict, List, Protocol
+
+
+class UserSimulatorProtocol(Protocol):
+    def generate_user_message(self, scenario: Dict[str, Any], conversation_history: List[Dict[str, str]],
+                              turn_number: int) -> str: ...
+
+    def should_continue_conversation(self, scenario: Dict[str, Any], conversation: List[Dict[str, str]],
+                                     max_turns: int) -> bool: ...
+
+
+class ChatbotRunnerProtocol(Protocol):
+    def chat(self, user_message: str) -> str: ...
+
+    def reset(self) -> None: ...
+
+
+class EvaluatorProtocol(Protocol):
+    def evaluate_conversation(self, scenario: Dict[str, Any], conversation: List[Dict[str, str]]) -> Dict[str, Any]: ...
+
+    def generate_cursor_agent_instructions(self, evaluations: List[Dict[str, Any]],
+                                           scenario_results: List[Dict[str, Any]]) -> Any: ...
+
+
+# Stubs used only with `tester.py --stub`, to smoke-test the runner without the real framework modules
+STUB_SCENARIOS = [{"scenario_id": "stub", "name": "Stub smoke test"}]
+
+
+class StubUserSimulator:
+    def generate_user_message(self, *args, **kwargs): return "Test message"
+    def should_continue_conversation(self, *args, **kwargs): return False
+
+
+class StubChatbotRunner:
+    def chat(self, *args, **kwargs): return "Test response"
+    def reset(self): pass
+
+
+class StubEvaluator:
+    def evaluate_conversation(self, *args, **kwargs): return {"overall_score": 0, "issues": []}
+    def generate_cursor_agent_instructions(self, *args, **kwargs): return "No recommendations available"
@@ -0,0 +1,94 @@
+"""
+Chatbot Runner Profiler - Per-turn latency and token accounting for test runs
+"""
+
+import math
+import time
+from typing import Any, Dict, List, Optional
+
+
+def usage_counts(usage: Any) -> Dict[str, int]:
+    """
+    Extract token counts from an OpenAI-style usage object or dict.
+
+    Args:
+        usage: Usage with prompt_tokens, completion_tokens and prompt_tokens_details.cached_tokens
+
+    Returns:
+        Dict of token counts (empty if no usage is available)
+    """
+    if usage is None:
+        return {}
+
+    def field(obj, name):
+        if obj is None:
+            return None
+        return obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+
+    return {
+        "prompt_tokens": field(usage, "prompt_tokens") or 0,
+        "completion_tokens": field(usage, "completion_tokens") or 0,
+        "cached_tokens": field(field(usage, "prompt_tokens_details"), "cached_tokens") or 0
+    }
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+class ProfiledRunner:
+    """Wraps a chatbot runner and records latency (and token usage, if exposed) for every chat call"""
+
+    def __init__(self, runner, samples: Optional[List[Dict[str, Any]]] = None):
+        """
+        Args:
+            runner: Chatbot runner to delegate to
+            samples: List to record samples in (shared across runners to aggregate a whole suite)
+        """
+        self.runner = runner
+        self.samples = samples if samples is not None else []
+
+    def chat(self, *args, **kwargs):
+        start = time.perf_counter_ns()
+        response = self.runner.chat(*args, **kwargs)
+        sample = {"latency_ms": (time.perf_counter_ns() - start) / 1e6}
+        # Runners that keep the provider response's usage around expose it as last_usage
+        sample.update(usage_counts(getattr(self.runner, "last_usage", None)))
+        self.samples.append(sample)
+        return response
+
+    def __getattr__(self, name):
+        # Everything else (reset, ...) goes straight to the wrapped runner
+        return getattr(self.runner, name)
+
+
+def format_summary(samples: List[Dict[str, Any]]) -> str:
+    """
+    Summarize recorded samples: latency percentiles, prompt cache hit rate and token totals.
+
+    Args:
+        samples: Samples recorded by ProfiledRunner
+
+    Returns:
+        Multi-line summary table
+    """
+    if not samples:
+        return "No chatbot calls recorded."
+
+    latencies = [sample["latency_ms"] for sample in samples]
+    lines = [
+        f"Chatbot calls: {len(samples)}",
+        f"Latency (ms):  p50 {percentile(latencies, 50):.0f} | p95 {percentile(latencies, 95):.0f} | max {max(latencies):.0f}"
+    ]
+
+    prompt_tokens = sum(sample.get("prompt_tokens", 0) for sample in samples)
+    if prompt_tokens:
+        cached_tokens = sum(sample.get("cached_tokens", 0) for sample in samples)
+        completion_tokens = sum(sample.get("completion_tokens", 0) for sample in samples)
+        lines.append(
+            f"Tokens:        prompt {prompt_tokens} (cached {cached_tokens}, {cached_tokens / prompt_tokens:.0%}) | "
+            f"completion {completion_tokens}"
+        )
+    return "\n".join(lines)
@@ -2,193 +2,365 @@
 Main Test Runner - Orchestrates the automated testing process
 
 NOTE: Testing framework components (test_scenarios, user_simulator, chatbot_runner, evaluator)
-are currently not available. This file is kept for future implementation.
+are currently not available. Run with --stub to smoke-test the runner with explicit stubs
+(see interfaces.py) until they are implemented.
 """
 
 import os
 import json
+import hashlib
+import itertools
+import logging
+import pickle
+import threading
+import uuid
 from datetime import datetime
-from typing import List, Dict, Any
+from pathlib import Path
+from typing import Callable, List, Dict, Any, Optional
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
-# Import testing modules - handle missing modules gracefully
+# Prefer orjson for transcript serialization, falling back to the stdlib
+try:
+    import orjson
+
+    def dump_json_line(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+except ImportError:
+    def dump_json_line(obj: Any) -> bytes:
+        return (json.dumps(obj) + "\n").encode("utf-8")
+
+from interfaces import ChatbotRunnerProtocol, EvaluatorProtocol, UserSimulatorProtocol
+from profiler import ProfiledRunner, format_summary
+
+# Import testing modules - ChatTester raises if they are missing and no components are injected
 try:
     from test_scenarios import TEST_SCENARIOS
     from user_simulator import UserSimulator
     from chatbot_runner import ChatbotRunner
     from evaluator import ConversationEvaluator
-    TESTING_MODULES_AVAILABLE = True
+    TESTING_MODULES_ERROR = None
 except ImportError as e:
-    print(f"⚠️  Warning: Testing framework modules not available: {e}")
-    print("   The testing framework requires the following modules:")
-    print("   - test_scenarios.py")
-    print("   - user_simulator.py")
-    print("   - chatbot_runner.py")
-    print("   - evaluator.py")
-    TESTING_MODULES_AVAILABLE = False
-    # Stub classes to prevent crashes
+    TESTING_MODULES_ERROR = e
     TEST_SCENARIOS = []
-    class UserSimulator:
-        def __init__(self): pass
-        def generate_user_message(self, *args, **kwargs): return "Test message"
-        def should_continue_conversation(self, *args, **kwargs): return False
-    class ChatbotRunner:
-        def __init__(self): pass
-        def chat(self, *args, **kwargs): return "Test response"
-        def reset(self): pass
-    class ConversationEvaluator:
-        def __init__(self): pass
-        def evaluate_conversation(self, *args, **kwargs): return {"overall_score": 0, "issues": []}
-        def generate_cursor_agent_instructions(self, *args, **kwargs): return "No recommendations available"
+    UserSimulator = ChatbotRunner = ConversationEvaluator = None
+
+# Progress goes to a logger; per-turn transcript lines are DEBUG (shown with --verbose).
+# Full transcripts are always in the conversations NDJSON file, not stdout.
+log = logging.getLogger("wellnav.tester")
+
+# Scenario lookup by ID, built once at import
+SCENARIO_INDEX = {s["scenario_id"]: s for s in TEST_SCENARIOS}
+
+# Chatbot responses are cached across runs, keyed on the system prompt and the conversation so far
+RESPONSE_CACHE_FILE = ".response_cache.pkl"
+RESPONSE_CACHE_MAX_ENTRIES = 4096
+SYSTEM_PROMPT_FILE = Path(__file__).resolve().parent.parent / "prompts" / "system.md"
+
+
+def system_prompt_hash() -> bytes:
+    """Hash the system prompt so cached responses are invalidated when it changes"""
+    try:
+        return hashlib.blake2b(SYSTEM_PROMPT_FILE.read_bytes(), digest_size=16).digest()
+    except OSError:
+        return b""
 
 
 class ChatTester:
     """Main test runner for WellNavigator chatbot"""
     
-    def __init__(self, output_dir: str = "output"):
+    def __init__(self, output_dir: str = "output", use_response_cache: bool = True, run_timestamp: str = None,
+                 user_simulator: Optional[UserSimulatorProtocol] = None,
+                 chatbot_runner_factory: Optional[Callable[[], ChatbotRunnerProtocol]] = None,
+                 evaluator: Optional[EvaluatorProtocol] = None,
+                 scenarios: Optional[List[Dict[str, Any]]] = None):
+        """
+        Args:
+            output_dir: Directory for transcripts, recommendations and the response cache
+            use_response_cache: Reuse cached chatbot responses from earlier runs
+            run_timestamp: Timestamp identifying this run (output file names add a unique suffix)
+            user_simulator: User simulator (defaults to user_simulator.UserSimulator)
+            chatbot_runner_factory: Creates a chatbot runner (defaults to chatbot_runner.ChatbotRunner)
+            evaluator: Conversation evaluator (defaults to evaluator.ConversationEvaluator)
+            scenarios: Scenarios to choose from (defaults to test_scenarios.TEST_SCENARIOS)
+        """
+        if TESTING_MODULES_ERROR is not None and None in (user_simulator, chatbot_runner_factory, evaluator):
+            raise ImportError(
+                "Testing framework modules not available "
+                f"(test_scenarios, user_simulator, chatbot_runner, evaluator): {TESTING_MODULES_ERROR}. "
+                "Inject components explicitly or run with --stub."
+            )
+        
         self.output_dir = output_dir
         self.conversations_dir = os.path.join(output_dir, "conversations")
         self.recommendations_dir = os.path.join(output_dir, "recommendations")
-        self.modules_available = TESTING_MODULES_AVAILABLE
-        
-        if not self.modules_available:
-            print("⚠️  Testing framework modules not available. Testing will be limited.")
-            return
+        self.scenarios = TEST_SCENARIOS if scenarios is None else scenarios
+        self.scenario_index = SCENARIO_INDEX if scenarios is None else {s["scenario_id"]: s for s in scenarios}
+        self.response_cache_file = os.path.join(output_dir, RESPONSE_CACHE_FILE)
+        self.response_cache = self.load_response_cache() if use_response_cache else None
+        # Concurrent scenarios share the response cache
+        self.response_cache_lock = threading.Lock()
+        self.prompt_hash = system_prompt_hash()
+        # One timestamp per suite run; scenarios are numbered within the run. The random suffix keeps
+        # runs started within the same second from writing to each other's output files
+        self.run_timestamp = run_timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.run_id = f"{self.run_timestamp}_{uuid.uuid4().hex[:6]}"
+        self.scenario_sequence = itertools.count(1)
+        self.pending_results = []
+        # Latency/token samples from every chatbot call in this run
+        self.profile_samples = []
         
         # Initialize components
-        self.user_simulator = UserSimulator()
-        self.chatbot_runner = ChatbotRunner()
-        self.evaluator = ConversationEvaluator()
+        self.user_simulator = user_simulator or UserSimulator()
+        self.chatbot_runner_factory = chatbot_runner_factory or ChatbotRunner
+        self.chatbot_runner = ProfiledRunner(self.chatbot_runner_factory(), self.profile_samples)
+        self.evaluator = evaluator or ConversationEvaluator()
         
         # Ensure output directories exist
         os.makedirs(self.conversations_dir, exist_ok=True)
         os.makedirs(self.recommendations_dir, exist_ok=True)
     
-    def run_scenario(self, scenario: Dict[str, Any], max_turns: int = 10) -> Dict[str, Any]:
+    def run_scenario(self, scenario: Dict[str, Any], max_turns: int = 10, chatbot_runner=None) -> Dict[str, Any]:
         """
         Run a single test scenario.
         
         Args:
             scenario: Test scenario definition
             max_turns: Maximum conversation turns
+            chatbot_runner: Runner to use instead of the shared one (needed when scenarios run concurrently)
         
         Returns:
             Dict with conversation and results
         """
-        if not self.modules_available:
-            print(f"\n⚠️  Cannot run scenario '{scenario.get('name', 'Unknown')}': Testing framework modules not available.")
-            return {
-                "scenario": scenario,
-                "conversation": [],
-                "evaluation": {"overall_score": 0, "error": "Testing modules not available"},
-                "status": "error"
-            }
-        
-        print(f"\n{'='*60}")
-        print(f"Running Scenario: {scenario['name']}")
-        print(f"{'='*60}")
-        
-        # Reset chatbot for new conversation
-        self.chatbot_runner.reset()
-        
-        conversation = []
-        turn = 0
+        scenario_id = scenario["scenario_id"]
+        log.info("Running Scenario: %s (%s)", scenario["name"], scenario_id)
         
-        # Run conversation
-        while turn < max_turns:
-            # Generate user message
-            user_message = self.user_simulator.generate_user_message(
-                scenario=scenario,
-                conversation_history=conversation,
-                turn_number=turn
-            )
-            
-            print(f"\n[User Turn {turn + 1}]")
-            print(f"User: {user_message}")
-            
-            # Get chatbot response
-            bot_response = self.chatbot_runner.chat(user_message)
-            
-            print(f"\n[Bot Response]")
-            print(f"Bot: {bot_response}")
-            
-            # Add to conversation
-            conversation.append({"role": "user", "content": user_message})
-            conversation.append({"role": "assistant", "content": bot_response})
-            
-            # Check if conversation should continue
-            if not self.user_simulator.should_continue_conversation(
-                scenario, conversation, max_turns
-            ):
-                print("\n[Conversation ended naturally]")
-                break
-            
-            turn += 1
+        chatbot_runner = chatbot_runner or self.chatbot_runner
+        conversation = self.run_conversation(scenario, max_turns, chatbot_runner, self.response_cache is not None)
+        if conversation is None:
+            # Cached replies ran out partway through; the runner never saw them, so start over live
+            log.info("[%s] Left the cached transcript, re-running live", scenario_id)
+            conversation = self.run_conversation(scenario, max_turns, chatbot_runner, False)
         
         # Evaluate conversation
-        print(f"\n[Evaluating conversation...]")
+        log.debug("[%s] Evaluating conversation...", scenario_id)
         evaluation = self.evaluator.evaluate_conversation(scenario, conversation)
         
-        print(f"Overall Score: {evaluation.get('overall_score', 'N/A')}/100")
-        print(f"Issues Found: {len(evaluation.get('issues', []))}")
-        
-        # Save conversation transcript
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        conversation_file = os.path.join(
-            self.conversations_dir,
-            f"{scenario['scenario_id']}_{timestamp}.json"
+        log.info(
+            "[%s] Overall Score: %s/100, Issues Found: %d",
+            scenario_id, evaluation.get("overall_score", "N/A"), len(evaluation.get("issues", []))
         )
         
+        # Buffer the conversation transcript; flush() writes the whole run at once
         result = {
             "scenario": scenario,
             "conversation": conversation,
             "evaluation": evaluation,
-            "timestamp": timestamp
+            "timestamp": self.run_timestamp,
+            "run_id": self.run_id,
+            "sequence": next(self.scenario_sequence)
         }
         
-        with open(conversation_file, 'w') as f:
-            json.dump(result, f, indent=2)
-        
-        print(f"Conversation saved to: {conversation_file}")
+        self.pending_results.append(result)
         
         return result
     
-    def run_all_scenarios(self, scenario_ids: List[str] = None) -> List[Dict[str, Any]]:
+    def run_conversation(self, scenario: Dict[str, Any], max_turns: int, chatbot_runner,
+                         replay_cache: bool) -> Optional[List[Dict[str, str]]]:
+        """
+        Converse with the chatbot from a fresh start.
+        
+        Args:
+            scenario: Test scenario definition
+            max_turns: Maximum conversation turns
+            chatbot_runner: Runner for this conversation
+            replay_cache: Serve chatbot replies from the response cache while the whole conversation so
+                far is a cached transcript
+        
+        Returns:
+            The conversation, or None if it left the cached transcript after the first turn (the runner
+            never saw the cached turns, so the caller re-runs the scenario live)
+        """
+        scenario_id = scenario["scenario_id"]
+        chatbot_runner.reset()
+        conversation = []
+        turn = 0
+        
+        # Run conversation
+        # The next user message is generated speculatively while should_continue_conversation runs,
+        # since both only depend on the transcript so far; it is discarded if the conversation ends.
+        # The pool is shut down without waiting, so a discarded generation never delays the scenario
+        next_message_future = None
+        speculation = ThreadPoolExecutor(max_workers=1)
+        try:
+            while turn < max_turns:
+                # Generate user message
+                if next_message_future is not None:
+                    user_message = next_message_future.result()
+                else:
+                    user_message = self.user_simulator.generate_user_message(
+                        scenario=scenario,
+                        conversation_history=conversation,
+                        turn_number=turn
+                    )
+                
+                log.debug("[%s] User Turn %d: %s", scenario_id, turn + 1, user_message)
+                
+                # Get chatbot response; cached replies are used only while every turn so far was cached
+                bot_response = self.get_cached_response(conversation, user_message) if replay_cache else None
+                if bot_response is None:
+                    if replay_cache and conversation:
+                        return None  # Left the cached transcript partway through
+                    replay_cache = False
+                    bot_response = chatbot_runner.chat(user_message)
+                    self.cache_response(conversation, user_message, bot_response)
+                
+                log.debug("[%s] Bot: %s", scenario_id, bot_response)
+                
+                # Add to conversation
+                conversation.append({"role": "user", "content": user_message})
+                conversation.append({"role": "assistant", "content": bot_response})
+                
+                next_message_future = None
+                if turn + 1 < max_turns:
+                    next_message_future = speculation.submit(
+                        self.user_simulator.generate_user_message,
+                        scenario=scenario,
+                        conversation_history=list(conversation),
+                        turn_number=turn + 1
+                    )
+                
+                # Check if conversation should continue
+                if not self.user_simulator.should_continue_conversation(
+                    scenario, conversation, max_turns
+                ):
+                    log.info("[%s] Conversation ended naturally", scenario_id)
+                    break
+                
+                turn += 1
+        finally:
+            speculation.shutdown(wait=False, cancel_futures=True)
+        
+        
+        return conversation
+    
+    def flush(self) -> str:
+        """
+        Write all buffered conversation transcripts to one NDJSON file for this run.
+        
+        Returns:
+            Path to the transcripts file, or None if nothing was buffered
+        """
+        if not self.pending_results:
+            return None
+        
+        conversations_file = os.path.join(
+            self.conversations_dir,
+            f"conversations_{self.run_id}.ndjson"
+        )
+        with open(conversations_file, 'ab') as f:
+            f.writelines(dump_json_line(result) for result in self.pending_results)
+        self.pending_results = []
+        
+        log.info("Conversations saved to: %s", conversations_file)
+        return conversations_file
+    
+    def load_response_cache(self) -> Dict[bytes, str]:
+        """Load cached chatbot responses from a previous run, if any"""
+        try:
+            with open(self.response_cache_file, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return {}
+    
+    def save_response_cache(self):
+        """Persist cached chatbot responses for the next run"""
+        if self.response_cache is None:
+            return
+        os.makedirs(self.output_dir, exist_ok=True)
+        with open(self.response_cache_file, 'wb') as f, self.response_cache_lock:
+            pickle.dump(self.response_cache, f)
+    
+    def response_cache_key(self, conversation: List[Dict[str, str]], user_message: str) -> bytes:
+        """Hash the system prompt, conversation so far and latest user message into a response cache key"""
+        key_material = json.dumps([conversation, user_message], sort_keys=True).encode()
+        return hashlib.blake2b(self.prompt_hash + key_material, digest_size=16).digest()
+    
+    def get_cached_response(self, conversation: List[Dict[str, str]], user_message: str) -> Optional[str]:
+        """Look up the chatbot's reply to the same conversation from an earlier run, if any"""
+        cache_key = self.response_cache_key(conversation, user_message)
+        with self.response_cache_lock:
+            return self.response_cache.get(cache_key)
+    
+    def cache_response(self, conversation: List[Dict[str, str]], user_message: str, response: str):
+        """Cache a live chatbot reply for later runs (if the response cache is enabled)"""
+        if self.response_cache is None:
+            return
+        cache_key = self.response_cache_key(conversation, user_message)
+        with self.response_cache_lock:
+            if len(self.response_cache) >= RESPONSE_CACHE_MAX_ENTRIES:
+                self.response_cache.pop(next(iter(self.response_cache)), None)
+            self.response_cache[cache_key] = response
+    
+    def run_all_scenarios(self, scenario_ids: List[str] = None, max_turns: int = 10,
+                          max_workers: int = 1) -> List[Dict[str, Any]]:
         """
         Run all or specified test scenarios.
         
         Args:
             scenario_ids: List of scenario IDs to run. If None, runs all.
+            max_turns: Maximum conversation turns per scenario
+            max_workers: Number of scenarios to run concurrently (turns within a scenario stay sequential).
+                Each scenario gets its own runner, but the user simulator and evaluator are shared, so
+                only raise this if they are thread-safe
         
         Returns:
             List of test results
         """
         if scenario_ids is None:
-            scenarios_to_run = TEST_SCENARIOS
+            scenarios_to_run = self.scenarios
         else:
             scenarios_to_run = [
-                s for s in TEST_SCENARIOS 
-                if s["scenario_id"] in scenario_ids
+                self.scenario_index[scenario_id] for scenario_id in dict.fromkeys(scenario_ids)
+                if scenario_id in self.scenario_index
             ]
         
         results = []
         
-        for scenario in scenarios_to_run:
+        if max_workers > 1 and len(scenarios_to_run) > 1:
+            # Each scenario gets its own runner, since runners hold conversation state
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [
+                    executor.submit(
+                        self.run_scenario, scenario, max_turns,
+                        ProfiledRunner(self.chatbot_runner_factory(), self.profile_samples)
+                    )
+                    for scenario in scenarios_to_run
+                ]
+        else:
+            futures = None
+        
+        for i, scenario in enumerate(scenarios_to_run):
             try:
-                result = self.run_scenario(scenario)
+                if futures is not None:
+                    result = futures[i].result()
+                else:
+                    result = self.run_scenario(scenario, max_turns)
                 results.append({
                     "scenario_name": scenario["name"],
                     "scenario_id": scenario["scenario_id"],
                     "evaluation": result["evaluation"]
                 })
             except Exception as e:
-                print(f"\n[ERROR] Failed to run scenario {scenario['scenario_id']}: {str(e)}")
+                log.error("Failed to run scenario %s: %s", scenario["scenario_id"], e)
                 results.append({
                     "scenario_name": scenario["name"],
                     "scenario_id": scenario["scenario_id"],
                     "error": str(e)
                 })
         
+        self.flush()
+        self.save_response_cache()
         return results
     
     def generate_recommendations(self, results: List[Dict[str, Any]]) -> str:
@@ -201,9 +373,7 @@ class ChatTester:
         Returns:
             Path to recommendations file
         """
-        print(f"\n{'='*60}")
-        print("Generating Cursor Agent Instructions...")
-        print(f"{'='*60}")
+        log.info("Generating Cursor Agent Instructions...")
         
         # Get full evaluations (need to load conversation files for detailed issues)
         evaluations = []
@@ -211,24 +381,25 @@ class ChatTester:
             if "evaluation" in result:
                 evaluations.append(result["evaluation"])
         
-        # Generate instructions
+        # Generate instructions (a string, or an iterable of markdown chunks written as they are produced)
         instructions = self.evaluator.generate_cursor_agent_instructions(
             evaluations=evaluations,
             scenario_results=results
         )
         
         # Save recommendations
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         recommendations_file = os.path.join(
             self.recommendations_dir,
-            f"recommendations_{timestamp}.md"
+            f"recommendations_{self.run_id}.md"
         )
         
         with open(recommendations_file, 'w') as f:
-            f.write(instructions)
+            if isinstance(instructions, str):
+                f.write(instructions)
+            else:
+                f.writelines(instructions)
         
-        print(f"\nRecommendations saved to: {recommendations_file}")
-        print("\nYou can now review this file and provide it to Cursor agent for code improvements.")
+        log.info("Recommendations saved to: %s", recommendations_file)
         
         return recommendations_file
 
@@ -251,13 +422,55 @@ def main():
         help="Maximum conversation turns per scenario"
     )
     
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of scenarios to run concurrently (only if the user simulator and evaluator are thread-safe)"
+    )
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="Log every conversation turn"
+    )
+    parser.add_argument(
+        "--stub",
+        action="store_true",
+        help="Use stub components (interfaces.py) for an offline smoke test"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Ignore cached chatbot responses and run fresh inference"
+    )
+    
     args = parser.parse_args()
     
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(asctime)s %(message)s",
+        handlers=[logging.StreamHandler()]
+    )
+    
     # Initialize tester
-    tester = ChatTester()
+    run_timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    components = {}
+    if args.stub:
+        from interfaces import STUB_SCENARIOS, StubChatbotRunner, StubEvaluator, StubUserSimulator
+        components = dict(
+            user_simulator=StubUserSimulator(),
+            chatbot_runner_factory=StubChatbotRunner,
+            evaluator=StubEvaluator(),
+            scenarios=STUB_SCENARIOS
+        )
+    tester = ChatTester(use_response_cache=not args.no_cache, run_timestamp=run_timestamp, **components)
     
     # Run tests
-    results = tester.run_all_scenarios(scenario_ids=args.scenarios)
+    results = tester.run_all_scenarios(
+        scenario_ids=args.scenarios,
+        max_turns=args.max_turns,
+        max_workers=args.workers
+    )
     
     # Generate recommendations
     recommendations_file = tester.generate_recommendations(results)
@@ -265,6 +478,7 @@ def main():
     print(f"\n{'='*60}")
     print("Testing Complete!")
     print(f"{'='*60}")
+    print(f"\n{format_summary(tester.profile_samples)}")
     print(f"\nReview recommendations in: {recommendations_file}")
     print("\nNext steps:")
     print("1. Review the recommendations file")
@@ -3,23 +3,52 @@ WellNavigator Workflow Agents Registry
 Workflows are invoked when user intent is conclusive and require structured interaction.
 """
 
-from typing import Dict, Optional
+import functools
+import importlib
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Tuple
 from workflows.base import WorkflowAgent
-from workflows.appointment_booking import AppointmentBookingWorkflow
-from workflows.clinical_trial_search import ClinicalTrialSearchWorkflow
 
-# Registry of all available workflows
-WORKFLOW_REGISTRY: Dict[str, WorkflowAgent] = {
-    "appointment_booking": AppointmentBookingWorkflow(),
-    "clinical_trial_search": ClinicalTrialSearchWorkflow(),
+# Workflow ID -> (module, class); workflows are imported and instantiated on first use
+_WORKFLOW_CLASSES: Dict[str, Tuple[str, str]] = {
+    "appointment_booking": ("workflows.appointment_booking", "AppointmentBookingWorkflow"),
+    "clinical_trial_search": ("workflows.clinical_trial_search", "ClinicalTrialSearchWorkflow"),
 }
+_CLASS_MODULES = {class_name: module_name for module_name, class_name in _WORKFLOW_CLASSES.values()}
+
+_INSTANCES: Dict[str, WorkflowAgent] = {}
+_WORKFLOW_IDS = tuple(_WORKFLOW_CLASSES)
 
 def get_workflow(workflow_id: str) -> Optional[WorkflowAgent]:
-    """Get a workflow by ID"""
-    return WORKFLOW_REGISTRY.get(workflow_id)
+    """Get a workflow by ID, importing and instantiating it on first use"""
+    workflow = _INSTANCES.get(workflow_id)
+    if workflow is None:
+        spec = _WORKFLOW_CLASSES.get(workflow_id)
+        if spec is None:
+            return None
+        module_name, class_name = spec
+        workflow_class = getattr(importlib.import_module(module_name), class_name)
+        workflow = _INSTANCES.setdefault(workflow_id, workflow_class())
+    return workflow
+
+def list_workflow_ids() -> Tuple[str, ...]:
+    """List the IDs of all available workflows (without loading them)"""
+    return _WORKFLOW_IDS
+
+@functools.lru_cache(maxsize=1)
+def list_workflows() -> Mapping[str, WorkflowAgent]:
+    """List all available workflows (read-only view of the registry, created once)"""
+    return MappingProxyType(globals().get("WORKFLOW_REGISTRY") or __getattr__("WORKFLOW_REGISTRY"))
 
-def list_workflows() -> Dict[str, WorkflowAgent]:
-    """List all available workflows"""
-    return WORKFLOW_REGISTRY.copy()
+def __getattr__(name: str):
+    """Build WORKFLOW_REGISTRY and expose the workflow classes lazily (PEP 562)"""
+    if name == "WORKFLOW_REGISTRY":
+        # Registry of all available workflows
+        registry = {workflow_id: get_workflow(workflow_id) for workflow_id in _WORKFLOW_IDS}
+        globals()["WORKFLOW_REGISTRY"] = registry
+        return registry
+    if name in _CLASS_MODULES:
+        return getattr(importlib.import_module(_CLASS_MODULES[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-__all__ = ['WORKFLOW_REGISTRY', 'get_workflow', 'list_workflows', 'WorkflowAgent']
+__all__ = ['WORKFLOW_REGISTRY', 'get_workflow', 'list_workflow_ids', 'list_workflows', 'WorkflowAgent']
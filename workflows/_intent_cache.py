@@ -0,0 +1,78 @@
+"""
+Semantic cache for workflow intent verdicts
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class SemanticIntentCache:
+    """
+    Caches intent verdicts by message embedding.
+    A lookup returns the verdict of the most similar cached message seen in the same conversation
+    context, provided cosine similarity clears the threshold. Only use it for low-temperature /
+    low-reasoning classifications, where the same question reliably gets the same verdict.
+    """
+
+    def __init__(self, embed: Callable[[str], Sequence[float]], threshold: float = 0.92,
+                 ttl: float = 3600.0, max_entries: int = 512):
+        """
+        Args:
+            embed: Returns the embedding of a text
+            threshold: Minimum cosine similarity for a cached verdict to be reused
+            ttl: Seconds a cached verdict stays valid
+            max_entries: Maximum number of cached verdicts (oldest are evicted first)
+        """
+        self.embed = embed
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # (context_key, normalized embedding, verdict, stored_at), oldest first
+        self._entries: List[Tuple[str, np.ndarray, Dict[str, Any], float]] = []
+        self._lock = threading.Lock()
+
+    def lookup(self, message: str, context_key: str) -> Tuple[Optional[Dict[str, Any]], Optional[np.ndarray]]:
+        """
+        Find a cached verdict for a message.
+
+        Returns:
+            Tuple of (cached verdict or None, the message's embedding to pass to store(), or None if
+            embedding failed)
+        """
+        try:
+            embedding = np.asarray(self.embed(message), dtype=np.float32)
+        except Exception:
+            return None, None
+        embedding /= np.linalg.norm(embedding) or 1.0
+
+        cutoff = time.monotonic() - self.ttl
+        with self._lock:
+            candidates = [
+                (vector, verdict) for key, vector, verdict, stored_at in self._entries
+                if key == context_key and stored_at >= cutoff
+            ]
+        if candidates:
+            similarities = np.stack([vector for vector, _ in candidates]) @ embedding
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.threshold:
+                return candidates[best][1], embedding
+        return None, embedding
+
+    def store(self, context_key: str, embedding: Optional[np.ndarray], verdict: Dict[str, Any]):
+        """Cache a verdict under the embedding returned by lookup()"""
+        if embedding is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._entries = [entry for entry in self._entries if entry[3] >= now - self.ttl]
+            if len(self._entries) >= self.max_entries:
+                del self._entries[0]
+            self._entries.append((context_key, embedding, verdict, now))
+
+    def clear(self):
+        """Drop all cached verdicts"""
+        with self._lock:
+            self._entries.clear()
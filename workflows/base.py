@@ -2,11 +2,23 @@
 Base WorkflowAgent class for WellNavigator workflows
 """
 
+import os
+import re
+import time
 from abc import ABC, abstractmethod
 from typing import Dict, Any, Optional, List
 import streamlit as st
 
 
+def demo_pause(seconds: float):
+    """
+    Pause so demo animations (progress bars, staged status text) are visible.
+    Only sleeps when WELLNAV_DEMO_DELAY is set; otherwise workflows run at full speed.
+    """
+    if os.getenv("WELLNAV_DEMO_DELAY"):
+        time.sleep(seconds)
+
+
 class WorkflowAgent(ABC):
     """
     Base class for all workflow agents.
@@ -14,11 +26,15 @@ class WorkflowAgent(ABC):
     They run to completion and then return control to the conversation.
     """
     
-    def __init__(self, workflow_id: str, name: str, description: str, triggers: List[str]):
+    def __init__(self, workflow_id: str, name: str, description: str, triggers: List[str],
+                 keyword_pattern: Optional[str] = None):
         self.workflow_id = workflow_id
         self.name = name
         self.description = description
         self.triggers = triggers  # Keywords/intents that might trigger this workflow
+        # Cheap prefilter regex: should_trigger is only worth calling when this matches the message.
+        # Defaults to the trigger phrases; override with something broader if should_trigger is smarter.
+        self.keyword_pattern = keyword_pattern or "|".join(re.escape(t) for t in triggers)
     
     @abstractmethod
     def should_trigger(self, user_message: str, conversation_context: List[Dict[str, str]]) -> Dict[str, Any]:
@@ -3,15 +3,86 @@ Clinical Trial Search Workflow
 Performs a background search for relevant clinical trials and displays results.
 """
 
-from workflows.base import WorkflowAgent
+from workflows.base import WorkflowAgent, demo_pause
 from typing import Dict, Any, List
 import streamlit as st
-import time
+import re
+from types import MappingProxyType
+
+# Keyword scans are compiled into single regexes (plain substring alternations, so a message
+# matches exactly when one of the keywords appears in it, as with `keyword in message`)
+HIGH_CONFIDENCE_KEYWORDS = (
+    "clinical trial", "clinical trials", "find trials", "search for trials",
+    "research study", "research studies", "experimental treatment",
+    "participate in research", "clinical study"
+)
+MEDIUM_CONFIDENCE_KEYWORDS = ("trials", "research", "studies", "experimental")
+CONFIRMATION_KEYWORDS = ("yes", "okay", "sure")
+
+# Condition -> keywords that indicate it, in the order conditions are reported
+CONDITION_KEYWORDS = {
+    "diabetes": ("diabetes", "diabetic"),
+    "cancer": ("cancer", "oncology", "tumor"),
+    "cardiovascular": ("heart", "cardiac", "cardiovascular"),
+    "arthritis": ("arthritis", "joint"),
+}
+
+
+def compile_keywords(keywords) -> "re.Pattern":
+    """Compile keywords into one alternation regex"""
+    return re.compile("|".join(map(re.escape, keywords)))
+
+
+HIGH_CONFIDENCE_RE = compile_keywords(HIGH_CONFIDENCE_KEYWORDS)
+MEDIUM_CONFIDENCE_RE = compile_keywords(MEDIUM_CONFIDENCE_KEYWORDS)
+CONFIRMATION_RE = compile_keywords(CONFIRMATION_KEYWORDS)
+# One named group per condition, so a single pass finds every condition mentioned
+CONDITION_RE = re.compile("|".join(
+    f"(?P<{condition}>{compile_keywords(keywords).pattern})"
+    for condition, keywords in CONDITION_KEYWORDS.items()
+))
 
 
 class ClinicalTrialSearchWorkflow(WorkflowAgent):
     """Workflow for searching clinical trials"""
     
+    # Mock trial templates, shared read-only across calls and sessions
+    _BASE_TRIALS = tuple(MappingProxyType(trial) for trial in (
+        {
+            "id": "CT-2024-001",
+            "title": "Novel Treatment Approaches for Chronic Conditions",
+            "focus": "Investigating new therapeutic interventions",
+            "location": "Multiple locations nationwide",
+            "status": "Recruiting",
+            "eligibility": "Adults 18-75 with relevant conditions",
+            "link": "https://clinicaltrials.gov/example-1"
+        },
+        {
+            "id": "CT-2024-002",
+            "title": "Long-term Safety and Efficacy Study",
+            "focus": "Safety monitoring and outcome assessment",
+            "location": "Regional Medical Centers",
+            "status": "Active, not recruiting",
+            "eligibility": "Participants from previous studies",
+            "link": "https://clinicaltrials.gov/example-2"
+        },
+        {
+            "id": "CT-2024-003",
+            "title": "Patient-Reported Outcomes Research",
+            "focus": "Quality of life and patient experience",
+            "location": "Online and local clinics",
+            "status": "Recruiting",
+            "eligibility": "All ages, various conditions welcome",
+            "link": "https://clinicaltrials.gov/example-3"
+        }
+    ))
+    
+    # Condition -> {trial index: fields to override}
+    _CONDITION_OVERRIDES = MappingProxyType({
+        "diabetes": {0: {"title": "Diabetes Management and Treatment Study", "focus": "New approaches to diabetes care"}},
+        "cancer": {1: {"title": "Oncology Treatment Protocols", "focus": "Cancer treatment effectiveness"}},
+    })
+    
     def __init__(self):
         super().__init__(
             workflow_id="clinical_trial_search",
@@ -19,43 +90,26 @@ class ClinicalTrialSearchWorkflow(WorkflowAgent):
             description="Search for relevant clinical trials based on user's condition",
             triggers=["clinical trial", "clinical trials", "research studies", "find trials",
                      "trials for", "participate in research", "experimental treatment",
-                     "clinical study", "research study"]
+                     "clinical study", "research study"],
+            # Covers both the high and medium confidence keywords checked in should_trigger
+            keyword_pattern=r"trial|research|stud(?:y|ies)|experimental"
         )
     
     def should_trigger(self, user_message: str, conversation_context: List[Dict[str, str]]) -> Dict[str, Any]:
         """Check if user wants to search for clinical trials"""
         message_lower = user_message.lower()
         
-        # High confidence triggers
-        high_confidence_keywords = [
-            "clinical trial", "clinical trials", "find trials", "search for trials",
-            "research study", "research studies", "experimental treatment",
-            "participate in research", "clinical study"
-        ]
-        
-        # Medium confidence triggers
-        medium_confidence_keywords = [
-            "trials", "research", "studies", "experimental"
-        ]
-        
         # Extract condition/context from message
         context_data = {}
         
         # Simple keyword extraction (in production, use NLP)
-        condition_keywords = []
-        if any(keyword in message_lower for keyword in ["diabetes", "diabetic"]):
-            condition_keywords.append("diabetes")
-        if any(keyword in message_lower for keyword in ["cancer", "oncology", "tumor"]):
-            condition_keywords.append("cancer")
-        if any(keyword in message_lower for keyword in ["heart", "cardiac", "cardiovascular"]):
-            condition_keywords.append("cardiovascular")
-        if any(keyword in message_lower for keyword in ["arthritis", "joint"]):
-            condition_keywords.append("arthritis")
+        mentioned = {match.lastgroup for match in CONDITION_RE.finditer(message_lower)}
+        condition_keywords = [condition for condition in CONDITION_KEYWORDS if condition in mentioned]
         
         context_data["conditions"] = condition_keywords if condition_keywords else ["general"]
         
         # Check for high confidence
-        if any(keyword in message_lower for keyword in high_confidence_keywords):
+        if HIGH_CONFIDENCE_RE.search(message_lower):
             return {
                 "should_trigger": True,
                 "confidence": "high",
@@ -64,10 +118,9 @@ class ClinicalTrialSearchWorkflow(WorkflowAgent):
             }
         
         # Check for medium confidence
-        if any(keyword in message_lower for keyword in medium_confidence_keywords):
-            # Check if user confirmed in conversation
-            recent_messages = " ".join([msg.get("content", "") for msg in conversation_context[-3:]])
-            if "yes" in message_lower or "okay" in message_lower or "sure" in message_lower:
+        if MEDIUM_CONFIDENCE_RE.search(message_lower):
+            # Check if the user confirmed in this message
+            if CONFIRMATION_RE.search(message_lower):
                 return {
                     "should_trigger": True,
                     "confidence": "high",
@@ -108,19 +161,19 @@ class ClinicalTrialSearchWorkflow(WorkflowAgent):
         # Simulate background search
         status_text.text("🔍 Searching databases...")
         progress_bar.progress(20)
-        time.sleep(0.5)
+        demo_pause(0.5)
         
         status_text.text("📊 Analyzing eligibility criteria...")
         progress_bar.progress(50)
-        time.sleep(0.5)
+        demo_pause(0.5)
         
         status_text.text("✅ Compiling results...")
         progress_bar.progress(80)
-        time.sleep(0.5)
+        demo_pause(0.5)
         
         progress_bar.progress(100)
         status_text.text("✅ Search complete!")
-        time.sleep(0.3)
+        demo_pause(0.3)
         
         # Clear progress indicators
         progress_bar.empty()
@@ -133,22 +186,21 @@ class ClinicalTrialSearchWorkflow(WorkflowAgent):
         
         st.success(f"Found {len(mock_trials)} potentially relevant clinical trials")
         
-        # Display results
-        for i, trial in enumerate(mock_trials, 1):
-            with st.expander(f"Trial {i}: {trial['title']}", expanded=(i == 1)):
-                col1, col2 = st.columns([2, 1])
-                
-                with col1:
-                    st.markdown(f"**Study Focus:** {trial['focus']}")
-                    st.markdown(f"**Location:** {trial['location']}")
-                    st.markdown(f"**Status:** {trial['status']}")
-                    if trial.get('eligibility'):
-                        st.markdown(f"**Eligibility:** {trial['eligibility']}")
-                
-                with col2:
-                    if trial.get('link'):
-                        st.link_button("Learn More", trial['link'], use_container_width=True)
-                    st.caption(f"Trial ID: {trial['id']}")
+        # Display results as one table (built column-wise) rather than a set of elements per trial
+        st.dataframe(
+            {
+                "Trial": [trial["title"] for trial in mock_trials],
+                "Study Focus": [trial["focus"] for trial in mock_trials],
+                "Location": [trial["location"] for trial in mock_trials],
+                "Status": [trial["status"] for trial in mock_trials],
+                "Eligibility": [trial.get("eligibility", "") for trial in mock_trials],
+                "Trial ID": [trial["id"] for trial in mock_trials],
+                "Learn More": [trial.get("link") for trial in mock_trials],
+            },
+            column_config={"Learn More": st.column_config.LinkColumn("Learn More")},
+            hide_index=True,
+            use_container_width=True
+        )
         
         st.markdown("---")
         st.info("💡 **Note:** These are example results. In the future, this will search real clinical trial databases. Always consult with your healthcare provider before considering participation in a clinical trial.")
@@ -165,43 +217,12 @@ class ClinicalTrialSearchWorkflow(WorkflowAgent):
     
     def _generate_mock_trials(self, conditions: List[str]) -> List[Dict[str, Any]]:
         """Generate mock clinical trial results"""
-        base_trials = [
-            {
-                "id": "CT-2024-001",
-                "title": "Novel Treatment Approaches for Chronic Conditions",
-                "focus": "Investigating new therapeutic interventions",
-                "location": "Multiple locations nationwide",
-                "status": "Recruiting",
-                "eligibility": "Adults 18-75 with relevant conditions",
-                "link": "https://clinicaltrials.gov/example-1"
-            },
-            {
-                "id": "CT-2024-002",
-                "title": "Long-term Safety and Efficacy Study",
-                "focus": "Safety monitoring and outcome assessment",
-                "location": "Regional Medical Centers",
-                "status": "Active, not recruiting",
-                "eligibility": "Participants from previous studies",
-                "link": "https://clinicaltrials.gov/example-2"
-            },
-            {
-                "id": "CT-2024-003",
-                "title": "Patient-Reported Outcomes Research",
-                "focus": "Quality of life and patient experience",
-                "location": "Online and local clinics",
-                "status": "Recruiting",
-                "eligibility": "All ages, various conditions welcome",
-                "link": "https://clinicaltrials.gov/example-3"
-            }
-        ]
+        # Fresh dicts per call, so results handed to the caller never alias the shared templates
+        trials = [dict(trial) for trial in self._BASE_TRIALS]
         
         # If specific conditions mentioned, adjust results slightly
-        if "diabetes" in conditions:
-            base_trials[0]["title"] = "Diabetes Management and Treatment Study"
-            base_trials[0]["focus"] = "New approaches to diabetes care"
-        
-        if "cancer" in conditions:
-            base_trials[1]["title"] = "Oncology Treatment Protocols"
-            base_trials[1]["focus"] = "Cancer treatment effectiveness"
+        for condition in conditions:
+            for index, fields in self._CONDITION_OVERRIDES.get(condition, {}).items():
+                trials[index].update(fields)
         
-        return base_trials
+        return trials